@@ -0,0 +1,320 @@
+import mmap
+import os
+import random
+import threading
+import time
+import curses
+import logging
+from collections import defaultdict
+
+import disk_scanner
+import diskforge
+
+MB = 1024 * 1024
+RANDOM_IO_SIZE = 4096
+# a worker gives up after this many failed requests in a row instead of spinning on a dying drive
+MAX_CONSECUTIVE_ERRORS = 10
+
+PROFILE_CONFIG = {
+    'zone_bytes': 256 * MB,  # read from each of the outer, mid and inner zones
+    'sequential_block': MB,
+    'queue_depths': (1, 32),
+    'random_duration': 10,  # seconds per queue depth
+    'sustained_duration': 120,
+    'sustained_interval': 5,
+}
+
+# anything below these is flagged, sustained_ratio is worst interval / first interval
+PROFILE_THRESHOLDS = {
+    'sequential_mbps': 60,
+    'random_read_iops': 50,
+    'random_write_iops': 50,
+    'sustained_ratio': 0.3,
+}
+
+
+def open_direct(disk_path, perform_write):
+    flags = os.O_RDWR if perform_write else os.O_RDONLY
+    try:
+        # O_DIRECT so we time the drive, not the page cache
+        return os.open(disk_path, flags | os.O_DIRECT), True
+    except OSError:
+        return os.open(disk_path, flags), False
+
+
+def measure_sequential(fd, offset, length, block_size, stop_event):
+    # mmap gives us a page-aligned buffer, which O_DIRECT needs
+    buffer = mmap.mmap(-1, block_size)
+    done = 0
+    start_time = time.time()
+    while done < length and not stop_event.is_set():
+        bytes_read = os.preadv(fd, [buffer], offset + done)
+        if bytes_read <= 0:
+            break
+        done += bytes_read
+    elapsed = time.time() - start_time
+    buffer.close()
+    return done / MB / elapsed if elapsed > 0 else 0
+
+
+def measure_random(fd, total_bytes, queue_depth, duration, perform_write, stop_event):
+    # queue depth is emulated with one thread per outstanding request, pread/pwrite release the GIL
+    max_block = total_bytes // RANDOM_IO_SIZE - 1
+    if max_block < 0:
+        return 0, 0
+    counts = [0] * queue_depth
+    errors = [0] * queue_depth
+    deadline = time.time() + duration
+
+    def worker(slot):
+        rng = random.Random()
+        buffer = mmap.mmap(-1, RANDOM_IO_SIZE)
+        consecutive_errors = 0
+        while time.time() < deadline and not stop_event.is_set():
+            offset = rng.randint(0, max_block) * RANDOM_IO_SIZE
+            try:
+                if perform_write:
+                    os.pwritev(fd, [buffer], offset)
+                else:
+                    os.preadv(fd, [buffer], offset)
+                counts[slot] += 1
+                consecutive_errors = 0
+            except OSError as e:
+                errors[slot] += 1
+                consecutive_errors += 1
+                if consecutive_errors >= MAX_CONSECUTIVE_ERRORS:
+                    logging.error(f"Random {'write' if perform_write else 'read'} worker giving up: {e}")
+                    break
+        buffer.close()
+
+    start_time = time.time()
+    threads = [threading.Thread(target=worker, args=(slot,)) for slot in range(queue_depth)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.time() - start_time
+    return (sum(counts) / elapsed if elapsed > 0 else 0), sum(errors)
+
+
+def measure_sustained(fd, total_bytes, duration, interval, block_size, stop_event, on_sample):
+    samples = []
+    # never write past the end of a disk smaller than one block
+    block_size = min(block_size, total_bytes // RANDOM_IO_SIZE * RANDOM_IO_SIZE)
+    if block_size == 0:
+        return samples
+    buffer = mmap.mmap(-1, block_size)
+    offset = 0
+    deadline = time.time() + duration
+
+    while time.time() < deadline and not stop_event.is_set():
+        written = 0
+        interval_start = time.time()
+        while time.time() - interval_start < interval and not stop_event.is_set():
+            if offset + block_size > total_bytes:
+                offset = 0
+            written += os.pwritev(fd, [buffer], offset)
+            offset += block_size
+        # make sure the interval is charged for everything it wrote
+        os.fdatasync(fd)
+        elapsed = time.time() - interval_start
+        samples.append(written / MB / elapsed if elapsed > 0 else 0)
+        on_sample(samples)
+
+    buffer.close()
+    return samples
+
+
+def expected_measurements(config, perform_write):
+    keys = ['outer_mbps', 'mid_mbps', 'inner_mbps']
+    keys += [f'rr_qd{queue_depth}_iops' for queue_depth in config['queue_depths']]
+    if perform_write:
+        keys += [f'rw_qd{queue_depth}_iops' for queue_depth in config['queue_depths']]
+        keys.append('sustained_ratio')
+    return keys
+
+
+def classify_profile(stats, thresholds):
+    if stats.get('io_errors'):
+        return 'FAILED', [f"{stats['io_errors']} I/O errors"]
+
+    issues = []
+    for zone in ('outer', 'mid', 'inner'):
+        if f'{zone}_mbps' in stats and stats[f'{zone}_mbps'] < thresholds['sequential_mbps']:
+            issues.append(f"{zone} {stats[f'{zone}_mbps']:.0f}MB/s")
+
+    for key in stats:
+        if key.startswith('rr_qd') and stats[key] < thresholds['random_read_iops']:
+            issues.append(f"{key} {stats[key]:.0f}")
+        elif key.startswith('rw_qd') and stats[key] < thresholds['random_write_iops']:
+            issues.append(f"{key} {stats[key]:.0f}")
+
+    if 'sustained_ratio' in stats and stats['sustained_ratio'] < thresholds['sustained_ratio']:
+        return 'COLLAPSE', issues + [f"sustained write fell to {stats['sustained_ratio']:.0%}"]
+    if issues:
+        return 'SLOW', issues
+    return 'OK', issues
+
+
+def profile_disk(disk_path, update_queue, lock, stop_event, perform_write, config, thresholds):
+    try:
+        total_bytes = diskforge.get_disk_size(disk_path)
+    except Exception as e:
+        with lock:
+            update_queue[disk_path]['error'] = f"Failed to get disk size: {e}"
+        return
+
+    def set_stat(key, value):
+        with lock:
+            update_queue[disk_path][key] = value
+
+    try:
+        fd, direct_io = open_direct(disk_path, perform_write)
+    except Exception as e:
+        set_stat('error', f"Failed to open disk: {e}")
+        return
+    set_stat('direct_io', direct_io)
+
+    def add_errors(errors):
+        with lock:
+            stats = update_queue[disk_path]
+            stats['io_errors'] = stats.get('io_errors', 0) + errors
+
+    try:
+        zone_bytes = min(config['zone_bytes'], total_bytes)
+        block_size = config['sequential_block']
+        zones = {
+            'outer': 0,
+            'mid': (total_bytes // 2) // block_size * block_size,
+            'inner': (total_bytes - zone_bytes) // block_size * block_size,
+        }
+        for zone, offset in zones.items():
+            if stop_event.is_set():
+                break
+            set_stat('status', f'SEQ {zone.upper()}')
+            set_stat(f'{zone}_mbps', measure_sequential(fd, offset, zone_bytes, block_size, stop_event))
+
+        for queue_depth in config['queue_depths']:
+            if stop_event.is_set():
+                break
+            set_stat('status', f'RAND READ QD{queue_depth}')
+            iops, errors = measure_random(fd, total_bytes, queue_depth, config['random_duration'], False, stop_event)
+            add_errors(errors)
+            set_stat(f'rr_qd{queue_depth}_iops', iops)
+
+        if perform_write and not stop_event.is_set():
+            # from here on the filesystem on this disk can't be trusted any more
+            set_stat('write_tested', True)
+            for queue_depth in config['queue_depths']:
+                if stop_event.is_set():
+                    break
+                set_stat('status', f'RAND WRITE QD{queue_depth}')
+                iops, errors = measure_random(fd, total_bytes, queue_depth, config['random_duration'], True,
+                                              stop_event)
+                add_errors(errors)
+                set_stat(f'rw_qd{queue_depth}_iops', iops)
+
+            def on_sample(samples):
+                with lock:
+                    stats = update_queue[disk_path]
+                    stats['sustained_mbps'] = samples[-1]
+                    stats['sustained_first_mbps'] = samples[0]
+                    stats['sustained_min_mbps'] = min(samples)
+                    stats['sustained_ratio'] = min(samples) / samples[0] if samples[0] else 0
+
+            if not stop_event.is_set():
+                set_stat('status', 'SUSTAINED WRITE')
+                measure_sustained(fd, total_bytes, config['sustained_duration'], config['sustained_interval'],
+                                  block_size, stop_event, on_sample)
+    except Exception as e:
+        set_stat('error', f"Profiling failed: {e}")
+    finally:
+        os.close(fd)
+
+    with lock:
+        stats = update_queue[disk_path]
+        missing = [key for key in expected_measurements(config, perform_write) if key not in stats]
+        if 'error' in stats:
+            classification, issues = 'ERROR', [stats['error']]
+        elif stop_event.is_set():
+            # a stopped run proves nothing, don't let the missing numbers pass as OK
+            classification, issues = 'STOPPED', [f"missing {', '.join(missing)}"] if missing else []
+        elif missing:
+            classification, issues = 'INCOMPLETE', [f"missing {', '.join(missing)}"]
+        elif not direct_io:
+            # buffered numbers measure the page cache, they say nothing about the drive
+            classification, issues = 'UNRELIABLE', ["direct I/O unavailable"]
+        else:
+            classification, issues = classify_profile(stats, thresholds)
+        stats['class'] = classification
+        stats['issues'] = ', '.join(issues) if issues else 'None'
+        stats['status'] = 'DONE'
+
+
+def draw_profile_stats(stdscr, y, x, disk_num, disk, update_queue, lock):
+    stdscr.addstr(y, x, f"Disk {disk_num}: {disk}")
+    with lock:
+        stats = update_queue[disk]
+        read_iops = '/'.join(f"{v:.0f}" for k, v in stats.items() if k.startswith('rr_qd')) or '-'
+        write_iops = '/'.join(f"{v:.0f}" for k, v in stats.items() if k.startswith('rw_qd')) or '-'
+        stdscr.addstr(y + 1, x, f"OUTER    = {stats.get('outer_mbps', 0):.1f} MB/s", curses.color_pair(1))
+        stdscr.addstr(y + 2, x, f"MID      = {stats.get('mid_mbps', 0):.1f} MB/s", curses.color_pair(1))
+        stdscr.addstr(y + 3, x, f"INNER    = {stats.get('inner_mbps', 0):.1f} MB/s", curses.color_pair(1))
+        stdscr.addstr(y + 4, x, f"RR IOPS  = {read_iops}", curses.color_pair(2))
+        stdscr.addstr(y + 5, x, f"RW IOPS  = {write_iops}", curses.color_pair(2))
+        stdscr.addstr(y + 6, x, f"SUSTAIN  = {stats.get('sustained_mbps', 0):.1f} MB/s", curses.color_pair(3))
+
+        classification = stats.get('class', '-')
+        if classification == 'OK':
+            class_color = curses.color_pair(7)
+        elif classification == '-':
+            class_color = curses.color_pair(1)
+        else:
+            class_color = curses.color_pair(6)
+        stdscr.addstr(y + 7, x, f"CLASS    = {classification}", class_color | curses.A_BOLD)
+
+        separator_y = y + 8
+        stdscr.addstr(separator_y, x, "-------------------", curses.color_pair(7) | curses.A_BOLD)
+
+        status_y = y + 9
+        status = stats.get('status', 'STARTING')
+        stdscr.addstr(status_y, x, f"{status[:28]}", curses.color_pair(7) | curses.A_BOLD)
+
+
+def profile_disks(disks, config=None, thresholds=None):
+    config = dict(PROFILE_CONFIG, **(config or {}))
+    thresholds = dict(PROFILE_THRESHOLDS, **(thresholds or {}))
+    update_queue = defaultdict(dict)
+    lock = threading.Lock()
+
+    disk_map = {i: disk for i, disk in enumerate(disks)}
+    stop_events = {i: threading.Event() for i in disk_map}
+
+    print("Do you want to profile write performance as well? This overwrites data on the disks (yes/no): ")
+    perform_write = input().lower() == 'yes'
+    if perform_write:
+        diskforge.confirm_action(disks)
+
+    threads = []
+    for i, disk in disk_map.items():
+        t = threading.Thread(target=profile_disk,
+                             args=(disk, update_queue, lock, stop_events[i], perform_write, config, thresholds))
+        t.start()
+        threads.append(t)
+
+    try:
+        curses.wrapper(disk_scanner.update_ui, update_queue, lock, disk_map, stop_events, draw_profile_stats)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for event in stop_events.values():
+            event.set()
+        for t in threads:
+            t.join()
+
+    disk_scanner.log_summary(update_queue, disk_map, 'diskforge_profile.log', "Diskforge Profile Summary")
+    os.system('reset')
+    print("Profiling complete. Summary written to diskforge_profile.log.")
+
+    # these have to be forged again even if their GPT and label survived
+    return [disk for disk in disks if update_queue[disk].get('write_tested')]
@@ -6,9 +6,9 @@ import threading
 from collections import defaultdict
 
 
-def log_summary(update_queue, disk_map):
-    with open('diskforge_scan.log', 'w') as log_file:
-        log_file.write("Diskforge Scan Summary\n")
+def log_summary(update_queue, disk_map, filename='diskforge_scan.log', title="Diskforge Scan Summary"):
+    with open(filename, 'w') as log_file:
+        log_file.write(f"{title}\n")
         log_file.write("=" * 30 + "\n")
         for disk_num, disk in disk_map.items():
             log_file.write(f"Disk {disk_num + 1} ({disk}):\n")
@@ -128,7 +128,7 @@ def draw_disk_stats(stdscr, y, x, disk_num, disk, update_queue, lock):
         stdscr.addstr(status_y, x, f"STATUS   = {status}", curses.color_pair(7) | curses.A_BOLD)
 
 
-def update_ui(stdscr, update_queue, lock, disk_map, stop_events):
+def update_ui(stdscr, update_queue, lock, disk_map, stop_events, draw_stats=draw_disk_stats):
     curses.curs_set(0)
     stdscr.nodelay(True)
     curses.echo()
@@ -172,7 +172,7 @@ def update_ui(stdscr, update_queue, lock, disk_map, stop_events):
                 continue
 
             stdscr.addstr(y, x, disk_display)
-            draw_disk_stats(stdscr, y, x, disk_num + 1, disk, update_queue, lock)
+            draw_stats(stdscr, y, x, disk_num + 1, disk, update_queue, lock)
 
         prompt_str = "Press 'q' to quit. Enter disk number to stop: "
         stdscr.addstr(height - 1, 0, prompt_str)
@@ -231,3 +231,5 @@ def scan_disks(disks):
     log_summary(update_queue, disk_map)
     os.system('reset')
     print("Scan complete. Summary written to diskforge_scan.log.")
+
+    return perform_write
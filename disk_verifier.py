@@ -0,0 +1,200 @@
+import os
+import random
+import threading
+import time
+
+from tqdm import tqdm
+from colorama import Fore, init, Style
+
+import diskforge
+
+init(autoreset=True)
+
+SECTOR_SIZE = 512
+BLOCK_SIZE = 4 * 1024 * 1024
+SAMPLE_COUNT = 1024
+# don't flood the certificate when a whole region is dirty
+MAX_REPORTED_LBAS = 1000
+
+
+def build_reference(pattern, block_size):
+    # preallocated once per disk, every block read is compared against it in a single memcmp
+    repeats = block_size // len(pattern) + 1
+    return bytes((pattern * repeats)[:block_size])
+
+
+def build_regions(disk_size, mode, block_size, samples, seed):
+    if mode == 'full' or disk_size <= block_size * samples:
+        return [(offset, min(block_size, disk_size - offset)) for offset in range(0, disk_size, block_size)]
+
+    # stratified sampling - split the disk into equal strata and pick one block at random in each
+    rng = random.Random(seed)
+    stratum_size = disk_size // samples
+    regions = []
+    for i in range(samples):
+        start = i * stratum_size
+        end = disk_size if i == samples - 1 else start + stratum_size
+        max_offset = max(start, end - block_size)
+        offset = rng.randrange(start, max_offset + 1) // SECTOR_SIZE * SECTOR_SIZE
+        regions.append((offset, min(block_size, disk_size - offset)))
+    return regions
+
+
+def find_bad_lbas(buffer, reference, offset, length):
+    # only reached when the block compare failed, narrow it down sector by sector
+    bad_lbas = []
+    for pos in range(0, length, SECTOR_SIZE):
+        end = min(pos + SECTOR_SIZE, length)
+        if buffer[pos:end] != reference[pos:end]:
+            bad_lbas.append((offset + pos) // SECTOR_SIZE)
+    return bad_lbas
+
+
+def verify_disk(disk_path, mode, samples, block_size, pattern, seed, results, lock, position):
+    certificate = {
+        'disk': disk_path,
+        'mode': mode,
+        'pattern': pattern.hex(),
+        'block_size': block_size,
+        'seed': seed,
+        'started': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'bytes_checked': 0,
+        'bad_lba_count': 0,
+        'bad_lbas': [],
+        'unreadable_regions': 0,
+    }
+
+    try:
+        disk_size = diskforge.get_disk_size(disk_path)
+    except Exception as e:
+        certificate['error'] = f"Failed to get disk size: {e}"
+        certificate['result'] = 'ERROR'
+        with lock:
+            results[disk_path] = certificate
+        return
+
+    certificate['disk_size'] = disk_size
+    regions = build_regions(disk_size, mode, block_size, samples, seed)
+    reference = build_reference(pattern, block_size)
+    buffer = bytearray(block_size)
+    certificate['bytes_planned'] = sum(length for _, length in regions)
+
+    # published early so callers can follow bytes_checked while the disk is being read
+    with lock:
+        results[disk_path] = certificate
+
+    # position None means nobody is watching a terminal, e.g. a fleet agent
+    progress_bar = tqdm(total=certificate['bytes_planned'], desc=disk_path, unit='B', unit_scale=True,
+                        position=position, leave=True, disable=position is None)
+
+    stage = "open disk"
+    try:
+        with open(disk_path, 'rb', buffering=0) as fd:
+            # drop cached pages so we check what is actually on the platter, not what the scanner left in RAM
+            stage = "drop page cache"
+            os.fsync(fd.fileno())
+            os.posix_fadvise(fd.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+            stage = "verify disk"
+            for offset, length in regions:
+                fd.seek(offset)
+                try:
+                    bytes_read = fd.readinto(buffer)
+                except OSError:
+                    bytes_read = None
+
+                if bytes_read != length:
+                    # an unreadable region can't be proven clear, count every sector in it as non-conforming
+                    certificate['unreadable_regions'] += 1
+                    certificate['bad_lba_count'] += (length + SECTOR_SIZE - 1) // SECTOR_SIZE
+                    if len(certificate['bad_lbas']) < MAX_REPORTED_LBAS:
+                        certificate['bad_lbas'].append(offset // SECTOR_SIZE)
+                    progress_bar.update(length)
+                    continue
+
+                if length == block_size:
+                    matches = buffer == reference
+                else:
+                    matches = buffer[:length] == reference[:length]
+
+                if not matches:
+                    bad_lbas = find_bad_lbas(buffer, reference, offset, length)
+                    certificate['bad_lba_count'] += len(bad_lbas)
+                    room = MAX_REPORTED_LBAS - len(certificate['bad_lbas'])
+                    certificate['bad_lbas'].extend(bad_lbas[:room])
+
+                certificate['bytes_checked'] += length
+                progress_bar.update(length)
+    except Exception as e:
+        certificate['error'] = f"Failed to {stage}: {e}"
+    finally:
+        progress_bar.close()
+
+    certificate['coverage'] = certificate['bytes_checked'] * 100 / disk_size if disk_size else 0
+    certificate['finished'] = time.strftime('%Y-%m-%d %H:%M:%S')
+    if 'error' not in certificate and certificate['bytes_checked'] == 0:
+        # nothing was read, so nothing is proven
+        certificate['error'] = "No data verified (disk size 0 or every region unreadable)"
+    if 'error' in certificate:
+        certificate['result'] = 'ERROR'
+    elif certificate['bad_lba_count']:
+        certificate['result'] = 'FAIL'
+    else:
+        certificate['result'] = 'PASS'
+
+    with lock:
+        results[disk_path] = certificate
+
+
+def write_certificates(results, disk_map):
+    with open('diskforge_verify.log', 'w') as log_file:
+        log_file.write("Diskforge Erase Verification Certificates\n")
+        log_file.write("=" * 30 + "\n")
+        for disk_num, disk in disk_map.items():
+            certificate = results.get(disk, {})
+            log_file.write(f"Disk {disk_num + 1} ({disk}):\n")
+            for key, value in certificate.items():
+                if key == 'bad_lbas':
+                    value = ', '.join(str(lba) for lba in value) if value else 'None'
+                elif key == 'coverage':
+                    value = f"{value:.4f}%"
+                log_file.write(f"{key}: {value}\n")
+            log_file.write("-" * 30 + "\n")
+
+
+def verify_disks(disks, mode='sampled', samples=SAMPLE_COUNT, block_size=BLOCK_SIZE, pattern=b'\0', seed=None):
+    if seed is None:
+        seed = int(time.time())
+
+    results = {}
+    lock = threading.Lock()
+    disk_map = {i: disk for i, disk in enumerate(disks)}
+
+    print(f"Verifying {len(disks)} disks ({mode}, pattern 0x{pattern.hex()})...")
+
+    threads = []
+    for i, disk in disk_map.items():
+        t = threading.Thread(target=verify_disk,
+                             args=(disk, mode, samples, block_size, pattern, seed, results, lock, i))
+        t.start()
+        threads.append(t)
+
+    for t in threads:
+        t.join()
+
+    write_certificates(results, disk_map)
+
+    for disk_num, disk in disk_map.items():
+        certificate = results[disk]
+        if certificate['result'] == 'PASS':
+            color = Fore.GREEN
+        else:
+            color = Fore.RED
+        disk_numbered = f"Disk {disk_num + 1:02d} ({disk})"
+        coverage = f"{certificate.get('coverage', 0):.2f}%"
+        detail = certificate.get('error', f"Bad LBAs: {certificate['bad_lba_count']}")
+        print(f"{color}{disk_numbered:<20} Result: {certificate['result']:<6} Coverage: {coverage:<8} {detail}"
+              f"{Style.RESET_ALL}")
+
+    print("Verification certificates written to diskforge_verify.log.")
+    return results
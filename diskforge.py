@@ -1,6 +1,7 @@
 import logging
 import math
 import os
+import struct
 import subprocess
 import sys
 import threading
@@ -14,6 +15,9 @@ init(autoreset=True)
 # logging
 logging.basicConfig(filename='/var/log/diskforge.log', level=logging.INFO)
 
+# Microsoft basic data partition type GUID (what parted's msftdata flag sets), as stored on disk (mixed-endian)
+MSFTDATA_GUID = bytes.fromhex('a2a0d0ebe5b9334487c068b6b72699c7')
+
 
 def confirm_action(disks):
     disk_names_with_numbers = [f"Disk {i + 1} ({disk})" for i, disk in enumerate(disks)]
@@ -246,6 +250,15 @@ def format_all_disks(disks):
     print(f"Total Failure: {len(failure_count):<5}")
 
 
+def get_disk_size(disk_path):
+    # seeking to the end works for block devices and plain image files alike
+    fd = os.open(disk_path, os.O_RDONLY)
+    try:
+        return os.lseek(fd, 0, os.SEEK_END)
+    finally:
+        os.close(fd)
+
+
 def get_disk_sizes(disks):
     disk_sizes = {}
 
@@ -308,6 +321,141 @@ def set_labels(disks):
             logging.error(f"Error setting label for disk {disk}: {e}")
 
 
+def read_gpt_partitions(fd):
+    # GPT header lives in LBA 1, try the usual logical sector sizes
+    for sector_size in (512, 4096):
+        fd.seek(sector_size)
+        header = fd.read(92)
+        if len(header) == 92 and header[:8] == b'EFI PART':
+            break
+    else:
+        return None, None
+
+    entries_lba, num_entries, entry_size = struct.unpack_from('<QII', header, 72)
+    if entry_size < 128 or num_entries > 1024:
+        return None, None
+
+    device_size = fd.seek(0, os.SEEK_END)
+    if entries_lba * sector_size + num_entries * entry_size > device_size:
+        raise ValueError("GPT partition entries lie beyond the end of the disk")
+
+    fd.seek(entries_lba * sector_size)
+    table = fd.read(num_entries * entry_size)
+
+    partitions = []
+    for i in range(len(table) // entry_size):
+        entry = table[i * entry_size:(i + 1) * entry_size]
+        type_guid = entry[:16]
+        # empty slots have an all-zero type GUID
+        if type_guid == b'\0' * 16:
+            continue
+        first_lba, last_lba = struct.unpack_from('<QQ', entry, 32)
+        partitions.append((type_guid, first_lba, last_lba))
+
+    return sector_size, partitions
+
+
+def read_exfat_label(fd, offset):
+    fd.seek(offset)
+    boot_sector = fd.read(512)
+    if len(boot_sector) != 512 or boot_sector[3:11] != b'EXFAT   ':
+        return None
+
+    cluster_heap_offset = struct.unpack_from('<I', boot_sector, 88)[0]
+    root_cluster = struct.unpack_from('<I', boot_sector, 96)[0]
+    bytes_per_sector_shift = boot_sector[108]
+    sectors_per_cluster_shift = boot_sector[109]
+
+    # spec limits: 512B-4KB sectors and clusters of at most 32MB, anything else is a corrupt header
+    if not 9 <= bytes_per_sector_shift <= 12 or sectors_per_cluster_shift > 25 - bytes_per_sector_shift:
+        return None
+    if root_cluster < 2:
+        return None
+
+    bytes_per_sector = 1 << bytes_per_sector_shift
+    cluster_size = bytes_per_sector << sectors_per_cluster_shift
+
+    # the volume label entry (0x83) sits in the root directory, normally in its first cluster
+    fd.seek(offset + (cluster_heap_offset + (root_cluster - 2) * (cluster_size // bytes_per_sector)) * bytes_per_sector)
+    root_dir = fd.read(cluster_size)
+
+    for pos in range(0, len(root_dir) - 31, 32):
+        entry_type = root_dir[pos]
+        if entry_type == 0x00:
+            break
+        if entry_type == 0x83:
+            char_count = min(root_dir[pos + 1], 11)
+            return root_dir[pos + 2:pos + 2 + char_count * 2].decode('utf-16-le', errors='replace')
+
+    return ''
+
+
+def inspect_disk(disk, size):
+    try:
+        with open(disk, 'rb') as fd:
+            sector_size, partitions = read_gpt_partitions(fd)
+            if partitions is None:
+                return False, "no GPT"
+            if len(partitions) != 1:
+                return False, f"{len(partitions)} partitions"
+
+            type_guid, first_lba, _ = partitions[0]
+            if type_guid != MSFTDATA_GUID:
+                return False, "partition is not msftdata"
+            if first_lba * sector_size >= fd.seek(0, os.SEEK_END):
+                return False, "corrupt GPT"
+
+            label = read_exfat_label(fd, first_lba * sector_size)
+    except OSError as e:
+        logging.error(f"Failed to inspect disk {disk}: {e}")
+        return False, f"unreadable ({e.strerror})"
+    except (ValueError, OverflowError) as e:
+        # half-written disks can carry offsets that don't even fit in a seek
+        logging.error(f"Corrupt GPT on disk {disk}: {e}")
+        return False, "corrupt GPT"
+
+    if label is None:
+        return False, "not exFAT"
+
+    expected_label = convert_size(size)
+    if label != expected_label:
+        return False, f"label '{label}' != '{expected_label}'"
+
+    return True, label
+
+
+def detect_forged_disks(disks, force=()):
+    disk_sizes = get_disk_sizes(disks)
+    forged = []
+    pending = []
+
+    for index, disk in enumerate(disks, start=1):
+        disk_numbered = f"Disk {index:02d} ({disk})"
+        if disk in force:
+            # write profiling scribbles over the filesystem without necessarily touching GPT or label
+            pending.append(disk)
+            print(f"{Fore.YELLOW}{disk_numbered:<20} Needs work: write-profiled{Style.RESET_ALL}")
+            logging.info(f"Disk {disk} needs forging: write-profiled")
+            continue
+        if disk not in disk_sizes:
+            pending.append(disk)
+            print(f"{Fore.YELLOW}{disk_numbered:<20} Needs work: size unknown{Style.RESET_ALL}")
+            continue
+
+        is_forged, detail = inspect_disk(disk, disk_sizes[disk])
+        if is_forged:
+            forged.append(disk)
+            print(f"{Fore.GREEN}{disk_numbered:<20} Already forged: {detail}{Style.RESET_ALL}")
+            logging.info(f"Disk {disk} already forged ({detail}), skipping")
+        else:
+            pending.append(disk)
+            print(f"{Fore.YELLOW}{disk_numbered:<20} Needs work: {detail}{Style.RESET_ALL}")
+            logging.info(f"Disk {disk} needs forging: {detail}")
+
+    print(f"Already forged: {len(forged):<5} Needs work: {len(pending):<5}")
+    return forged, pending
+
+
 def draw_disk_size_graph(disk_sizes):
     max_size = max(disk_sizes.values())
 
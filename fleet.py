@@ -0,0 +1,425 @@
+import argparse
+import json
+import logging
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+
+from tqdm import tqdm
+from colorama import Fore, init, Style
+
+import disk_profiler
+import disk_verifier
+import diskforge
+
+init(autoreset=True)
+
+# job profiles the coordinator can hand out, each one is a list of stages run per disk
+PROFILES = {
+    'detect': {'stages': ['detect'], 'options': {}},
+    'forge': {'stages': ['detect', 'forge'], 'options': {}},
+    'wipe-check': {'stages': ['verify'], 'options': {'mode': 'sampled', 'samples': disk_verifier.SAMPLE_COUNT}},
+    'benchmark': {'stages': ['profile'], 'options': {'perform_write': False}},
+    'benchmark-write': {'stages': ['profile'], 'options': {'perform_write': True}},
+}
+
+# default seconds between progress updates an agent sends for a long running stage
+PROGRESS_INTERVAL = 10
+
+
+def parse_address(address):
+    # unix:/path/to/socket or host:port
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[len('unix:'):]
+    host, port = address.rsplit(':', 1)
+    return socket.AF_INET, (host, int(port))
+
+
+def send_message(sock, lock, message):
+    data = (json.dumps(message) + '\n').encode()
+    with lock:
+        sock.sendall(data)
+
+
+def report(sock, lock, message, stop_event):
+    # losing the coordinator stops the run instead of killing every disk thread with a broken pipe
+    try:
+        send_message(sock, lock, message)
+        return True
+    except OSError as e:
+        if not stop_event.is_set():
+            logging.error(f"Lost connection to coordinator: {e}")
+        stop_event.set()
+        return False
+
+
+def is_destructive(stage, options):
+    return stage == 'forge' or (stage == 'profile' and options.get('perform_write', False))
+
+
+def run_detect(disk, options):
+    is_forged, detail = diskforge.inspect_disk(disk, diskforge.get_disk_size(disk))
+    return {'result': 'FORGED' if is_forged else 'PENDING', 'detail': detail}
+
+
+def run_forge(disk, options):
+    if run_detect(disk, options)['result'] == 'FORGED':
+        return {'result': 'SKIPPED', 'detail': 'already forged'}
+
+    # the per-disk stages want a progress bar, nobody is watching one on an agent
+    progress_bar = tqdm(total=2, disable=True)
+    success_count = []
+    failure_count = []
+    diskforge.clear_partitions(disk, progress_bar, success_count, failure_count)
+    if not failure_count:
+        # main.py gets away with its sleeps, here mkfs would race udev creating the partition node
+        subprocess.run(['udevadm', 'settle'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if not os.path.exists(disk + '1'):
+            return {'result': 'FAIL', 'detail': f"partition {disk}1 did not appear"}
+        diskforge.format_disk(disk, progress_bar, success_count, failure_count)
+    if failure_count:
+        return {'result': 'FAIL', 'detail': 'clear/format failed, see diskforge.log'}
+
+    diskforge.set_labels([disk])
+    detected = run_detect(disk, options)
+    return {'result': 'OK' if detected['result'] == 'FORGED' else 'FAIL', 'detail': detected['detail']}
+
+
+def run_verify(disk, options, live):
+    # live doubles as the verifier's results dict, which it fills in while reading
+    results = live
+    disk_verifier.verify_disk(disk, options.get('mode', 'sampled'),
+                              options.get('samples', disk_verifier.SAMPLE_COUNT),
+                              options.get('block_size', disk_verifier.BLOCK_SIZE),
+                              bytes.fromhex(options.get('pattern', '00')), options.get('seed', int(time.time())),
+                              results, threading.Lock(), None)
+    return results[disk]
+
+
+def run_profile(disk, options, stop_event, live):
+    update_queue = live
+    config = dict(disk_profiler.PROFILE_CONFIG, **options.get('config', {}))
+    thresholds = dict(disk_profiler.PROFILE_THRESHOLDS, **options.get('thresholds', {}))
+    disk_profiler.profile_disk(disk, update_queue, threading.Lock(), stop_event, options.get('perform_write', False),
+                               config, thresholds)
+    stats = dict(update_queue[disk])
+    stats['result'] = 'ERROR' if 'error' in stats else stats.get('class', 'ERROR')
+    return stats
+
+
+def describe_progress(stage, disk, live):
+    if stage == 'verify' and disk in live:
+        certificate = live[disk]
+        return {'bytes_checked': certificate.get('bytes_checked', 0),
+                'bytes_planned': certificate.get('bytes_planned', 0)}
+    if stage == 'profile' and disk in live:
+        return {'status': live[disk].get('status', 'STARTING')}
+    return {}
+
+
+def run_stage(stage, disk, options, stop_event, allow_destructive, live):
+    if is_destructive(stage, options) and not allow_destructive:
+        # a message from the network alone must never wipe local disks
+        return {'result': 'REJECTED', 'detail': "agent was not started with --allow-forge"}
+    if stage == 'detect':
+        return run_detect(disk, options)
+    if stage == 'forge':
+        return run_forge(disk, options)
+    if stage == 'verify':
+        return run_verify(disk, options, live)
+    if stage == 'profile':
+        return run_profile(disk, options, stop_event, live)
+    return {'result': 'ERROR', 'detail': f"unknown stage {stage}"}
+
+
+def run_disk_job(host, disk, job, sock, sock_lock, stop_event, allow_destructive,
+                 progress_interval=PROGRESS_INTERVAL):
+    options = job.get('options', {})
+    for stage in job['stages']:
+        if stop_event.is_set():
+            break
+        if not report(sock, sock_lock, {'type': 'status', 'host': host, 'disk': disk, 'stage': stage,
+                                        'state': 'RUNNING'}, stop_event):
+            break
+        live = defaultdict(dict)
+        outcome = []
+
+        def worker():
+            try:
+                outcome.append(run_stage(stage, disk, options, stop_event, allow_destructive, live))
+            except Exception as e:
+                logging.error(f"Stage {stage} failed for disk {disk}: {e}")
+                outcome.append({'result': 'ERROR', 'detail': str(e)})
+
+        # verify and profile can take hours, keep the coordinator posted while they run
+        stage_thread = threading.Thread(target=worker)
+        stage_thread.start()
+        while True:
+            stage_thread.join(timeout=progress_interval)
+            if not stage_thread.is_alive():
+                break
+            progress = describe_progress(stage, disk, live)
+            if progress:
+                report(sock, sock_lock, {'type': 'status', 'host': host, 'disk': disk, 'stage': stage,
+                                         'state': 'RUNNING', 'progress': progress}, stop_event)
+        result = outcome[0]
+
+        if not report(sock, sock_lock, {'type': 'result', 'host': host, 'disk': disk, 'stage': stage,
+                                        'result': result}, stop_event):
+            break
+
+
+def run_agent(address, host, disks, allow_destructive=False, progress_interval=PROGRESS_INTERVAL):
+    family, target = parse_address(address)
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.connect(target)
+    sock_lock = threading.Lock()
+    stop_event = threading.Event()
+
+    send_message(sock, sock_lock, {'type': 'hello', 'host': host, 'disks': disks})
+    reader = sock.makefile('r')
+    line = reader.readline()
+    if not line:
+        logging.error(f"Agent {host}: coordinator closed the connection before sending a job")
+        print(f"{Fore.RED}Agent {host}: coordinator closed the connection before sending a job{Style.RESET_ALL}")
+        sock.close()
+        return False
+    job = json.loads(line)
+    if job['type'] == 'error':
+        logging.error(f"Agent {host}: rejected by coordinator: {job['detail']}")
+        print(f"{Fore.RED}Agent {host}: rejected by coordinator: {job['detail']}{Style.RESET_ALL}")
+        sock.close()
+        return False
+    print(f"{Fore.GREEN}Agent {host}: running profile '{job['profile']}' on {len(disks)} disks{Style.RESET_ALL}")
+
+    if allow_destructive and 'forge' in job['stages']:
+        diskforge.unmount_disks_partitions(disks)
+
+    threads = []
+    for disk in disks:
+        t = threading.Thread(target=run_disk_job, args=(host, disk, job, sock, sock_lock, stop_event,
+                                                            allow_destructive, progress_interval))
+        t.start()
+        threads.append(t)
+
+    try:
+        for t in threads:
+            t.join()
+    except KeyboardInterrupt:
+        stop_event.set()
+        for t in threads:
+            t.join()
+
+    if report(sock, sock_lock, {'type': 'done', 'host': host}, stop_event):
+        print(f"Agent {host}: done.")
+        sock.close()
+        return True
+    print(f"{Fore.RED}Agent {host}: lost connection to coordinator, see diskforge.log{Style.RESET_ALL}")
+    sock.close()
+    return False
+
+
+class FleetState:
+    def __init__(self, expected_hosts, default_profile, schedule):
+        self.expected_hosts = expected_hosts
+        self.default_profile = default_profile
+        self.schedule = schedule
+        self.hosts = {}
+        self.disks = {}
+        self.finished_hosts = set()
+        self.condition = threading.Condition()
+
+    def job_for(self, host):
+        profile = self.schedule.get(host, self.default_profile)
+        return dict(PROFILES[profile], type='job', profile=profile)
+
+    def register(self, message):
+        with self.condition:
+            host = message['host']
+            # names key all the state, a second agent with the same name would clobber the first
+            if host in self.hosts:
+                return False
+            self.hosts[host] = {'disks': message['disks'], 'profile': self.job_for(host)['profile']}
+            for disk in message['disks']:
+                self.disks[(host, disk)] = {'stage': None, 'state': 'QUEUED', 'progress': {}, 'results': {}}
+            self.condition.notify_all()
+            return True
+
+    def handle(self, message):
+        with self.condition:
+            host = message['host']
+            if message['type'] == 'status':
+                entry = self.disks[(host, message['disk'])]
+                entry['stage'] = message['stage']
+                entry['state'] = message['state']
+                entry['progress'] = message.get('progress', {})
+            elif message['type'] == 'result':
+                entry = self.disks[(host, message['disk'])]
+                entry['results'][message['stage']] = message['result']
+                entry['state'] = message['result'].get('result', 'DONE')
+                logging.info(f"{host} {message['disk']} {message['stage']}: {entry['state']}")
+            elif message['type'] == 'done':
+                self.finished_hosts.add(host)
+            self.condition.notify_all()
+
+    def disconnected(self, host):
+        with self.condition:
+            if host is not None:
+                self.finished_hosts.add(host)
+            self.condition.notify_all()
+
+    def all_done(self):
+        return len(self.finished_hosts) >= self.expected_hosts
+
+    def progress(self):
+        with self.condition:
+            counts = defaultdict(int)
+            finished = 0
+            bytes_checked = 0
+            bytes_planned = 0
+            for (host, _), entry in self.disks.items():
+                counts[entry['state']] += 1
+                if host in self.finished_hosts:
+                    finished += 1
+                if entry['state'] == 'RUNNING':
+                    bytes_checked += entry['progress'].get('bytes_checked', 0)
+                    bytes_planned += entry['progress'].get('bytes_planned', 0)
+            verified = bytes_checked * 100 / bytes_planned if bytes_planned else None
+            return len(self.hosts), len(self.disks), finished, dict(counts), verified
+
+
+class AgentHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        state = self.server.fleet_state
+        host = None
+        try:
+            for line in self.rfile:
+                message = json.loads(line)
+                if message['type'] == 'hello':
+                    if not state.register(message):
+                        reply = {'type': 'error', 'detail': f"an agent named {message['host']} is already "
+                                                            f"connected, start this one with a unique --name"}
+                        self.wfile.write((json.dumps(reply) + '\n').encode())
+                        logging.error(f"Rejected duplicate agent name {message['host']}")
+                        break
+                    host = message['host']
+                    self.wfile.write((json.dumps(state.job_for(host)) + '\n').encode())
+                    self.wfile.flush()
+                else:
+                    state.handle(message)
+                    if message['type'] == 'done':
+                        break
+        except (ValueError, KeyError, OSError) as e:
+            logging.error(f"Agent {host} connection failed: {e}")
+        finally:
+            state.disconnected(host)
+
+
+class ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class ThreadingTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def write_fleet_summary(state, filename='diskforge_fleet.log'):
+    with open(filename, 'w') as log_file:
+        log_file.write("Diskforge Fleet Summary\n")
+        log_file.write("=" * 30 + "\n")
+        for host, info in sorted(state.hosts.items()):
+            log_file.write(f"Host {host} (profile {info['profile']}):\n")
+            for disk in info['disks']:
+                entry = state.disks[(host, disk)]
+                log_file.write(f"  {disk}: {entry['state']}\n")
+                for stage, result in entry['results'].items():
+                    log_file.write(f"    {stage}: {json.dumps(result)}\n")
+            log_file.write("-" * 30 + "\n")
+
+
+def run_coordinator(address, expected_hosts, default_profile, schedule, interval=5):
+    family, target = parse_address(address)
+    if family == socket.AF_UNIX:
+        if os.path.exists(target):
+            os.unlink(target)
+        server = ThreadingUnixServer(target, AgentHandler)
+    else:
+        server = ThreadingTCPServer(target, AgentHandler)
+    server.fleet_state = state = FleetState(expected_hosts, default_profile, schedule)
+
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+    print(f"Coordinator listening on {address}, waiting for {expected_hosts} agents...")
+
+    try:
+        with state.condition:
+            while not state.all_done():
+                state.condition.wait(timeout=interval)
+                hosts, total, finished, counts, verified = state.progress()
+                states = ', '.join(f"{key}: {value}" for key, value in sorted(counts.items()))
+                line = f"Hosts: {hosts}/{expected_hosts}  Disks: {total}  Finished: {finished}  [{states}]"
+                if verified is not None:
+                    line += f"  Verifying: {verified:.1f}%"
+                print(line)
+    except KeyboardInterrupt:
+        print("\nStopping coordinator...")
+    finally:
+        server.shutdown()
+        server.server_close()
+        if family == socket.AF_UNIX and os.path.exists(target):
+            os.unlink(target)
+
+    write_fleet_summary(state)
+    print("Fleet run complete. Summary written to diskforge_fleet.log.")
+    return state
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run diskforge across several hosts")
+    subparsers = parser.add_subparsers(dest='mode')
+
+    coordinator = subparsers.add_parser('coordinator', help="collect progress and results from agents")
+    coordinator.add_argument('--listen', required=True, help="unix:/path/to/socket or host:port")
+    coordinator.add_argument('--expect', type=int, required=True, help="number of agents to wait for")
+    coordinator.add_argument('--profile', default='detect', choices=sorted(PROFILES))
+    coordinator.add_argument('--schedule', action='append', default=[], metavar='HOST=PROFILE',
+                             help="run a different profile on a given host")
+
+    agent = subparsers.add_parser('agent', help="run the pipeline on this host and report to a coordinator")
+    agent.add_argument('--connect', required=True, help="unix:/path/to/socket or host:port")
+    agent.add_argument('--name', default=socket.gethostname())
+    agent.add_argument('--device', action='append', default=[],
+                       help="device or image file to work on instead of auto-detected disks")
+    agent.add_argument('--allow-forge', action='store_true',
+                       help="allow the coordinator to run destructive stages (forge, write profiling) here")
+    agent.add_argument('--progress-interval', type=float, default=PROGRESS_INTERVAL,
+                       help="seconds between progress updates for long running stages")
+
+    args = parser.parse_args(argv)
+    if args.mode is None:
+        parser.error("choose coordinator or agent")
+
+    if args.mode == 'coordinator':
+        schedule = {}
+        for item in args.schedule:
+            host, profile = item.split('=', 1)
+            if profile not in PROFILES:
+                parser.error(f"unknown profile {profile}")
+            schedule[host] = profile
+        run_coordinator(args.listen, args.expect, args.profile, schedule)
+    else:
+        disks = args.device or diskforge.identify_disks()
+        if not disks:
+            sys.exit(1)
+        if not run_agent(args.connect, args.name, disks, args.allow_forge, args.progress_interval):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
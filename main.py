@@ -1,7 +1,9 @@
 import signal
 import sys
 
+import disk_profiler
 import disk_scanner
+import disk_verifier
 import diskforge
 from colorama import Fore, init
 
@@ -35,19 +37,35 @@ if __name__ == "__main__":
     diskforge.visualize_disk_sizes(disks)
     print(f"{Fore.BLUE}=========== Umount Partitions ======")
     diskforge.unmount_disks_partitions(disks)
-    print(f"{Fore.BLUE}=========== Confirmation ===========")
-    diskforge.confirm_action(disks)
-    print(f"{Fore.BLUE}====================================")
-    diskforge.clear_partitions_all(disks)
-    print(f"{Fore.BLUE}====================================")
-    diskforge.format_all_disks(disks)
-    print(f"{Fore.BLUE}====================================")
-    diskforge.set_labels(disks)
-    print(f"{Fore.BLUE}====================================")
+    print(f"{Fore.BLUE}=========== Profiling ==============")
+    # profiling before forging, any disk that saw write tests is forged again below
+    write_tested_disks = []
+    if ask_user("Would you like to profile disk performance? (yes/no): "):
+        write_tested_disks = disk_profiler.profile_disks(disks)
+    print(f"{Fore.BLUE}=========== Forged Disks ===========")
+    _, pending_disks = diskforge.detect_forged_disks(disks, force=write_tested_disks)
+
+    if pending_disks:
+        print(f"{Fore.BLUE}=========== Confirmation ===========")
+        diskforge.confirm_action(pending_disks)
+        print(f"{Fore.BLUE}====================================")
+        diskforge.clear_partitions_all(pending_disks)
+        print(f"{Fore.BLUE}====================================")
+        diskforge.format_all_disks(pending_disks)
+        print(f"{Fore.BLUE}====================================")
+        diskforge.set_labels(pending_disks)
+        print(f"{Fore.BLUE}====================================")
+    else:
+        print(f"{Fore.GREEN}All disks are already forged, nothing to format.")
 
     if ask_user("Would you like to surface scan the disks? [If you need to remove disks please do it now] (yes/no): "):
         disks = diskforge.identify_disks()
-        disk_scanner.scan_disks(disks)
+        wiped = disk_scanner.scan_disks(disks)
+        if wiped and ask_user("Would you like to verify the disks were cleared? (yes/no): "):
+            if ask_user("Full verification? Answer 'no' for a fast sampled check (yes/no): "):
+                disk_verifier.verify_disks(disks, mode='full')
+            else:
+                disk_verifier.verify_disks(disks, mode='sampled')
     else:
         print(f"{Fore.GREEN}Exiting without surface scan.")
         sys.exit(0)
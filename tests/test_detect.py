@@ -0,0 +1,80 @@
+import struct
+
+import diskforge
+
+SECTOR = 512
+PARTITION_LBA = 2048
+
+
+def build_image(path, label, size=8 * 1024 * 1024, bytes_per_sector_shift=9, first_lba=PARTITION_LBA,
+                entries_lba=2):
+    image = bytearray(size)
+
+    header = bytearray(92)
+    header[:8] = b'EFI PART'
+    struct.pack_into('<QII', header, 72, entries_lba, 128, 128)
+    image[SECTOR:SECTOR + 92] = header
+
+    entry = bytearray(128)
+    entry[:16] = diskforge.MSFTDATA_GUID
+    struct.pack_into('<QQ', entry, 32, first_lba, size // SECTOR - 34)
+    image[2 * SECTOR:2 * SECTOR + 128] = entry
+
+    # real exFAT layout: heap offset @88, cluster count @92, root dir cluster @96
+    offset = PARTITION_LBA * SECTOR
+    boot_sector = bytearray(512)
+    boot_sector[3:11] = b'EXFAT   '
+    struct.pack_into('<III', boot_sector, 88, 64, 1000, 4)
+    boot_sector[108] = bytes_per_sector_shift
+    boot_sector[109] = 3
+    image[offset:offset + 512] = boot_sector
+
+    root_dir = offset + (64 + (4 - 2) * 8) * SECTOR
+    image[root_dir] = 0x81  # allocation bitmap entry comes first
+    image[root_dir + 32] = 0x83
+    image[root_dir + 33] = len(label)
+    encoded = label.encode('utf-16-le')
+    image[root_dir + 34:root_dir + 34 + len(encoded)] = encoded
+
+    path.write_bytes(bytes(image))
+    return path
+
+
+def test_inspect_disk_detects_forged_image(tmp_path):
+    image = build_image(tmp_path / 'disk.img', '16GB')
+    assert diskforge.inspect_disk(str(image), 15 * 1024 ** 3) == (True, '16GB')
+
+
+def test_inspect_disk_rejects_wrong_label(tmp_path):
+    image = build_image(tmp_path / 'disk.img', '16GB')
+    assert diskforge.inspect_disk(str(image), 500 * 1024 ** 3) == (False, "label '16GB' != '500GB'")
+
+
+def test_inspect_disk_rejects_blank_disk(tmp_path):
+    image = tmp_path / 'blank.img'
+    image.write_bytes(bytes(1024 * 1024))
+    assert diskforge.inspect_disk(str(image), 1024 ** 3) == (False, "no GPT")
+
+
+def test_read_exfat_label_rejects_corrupt_shifts(tmp_path):
+    image = build_image(tmp_path / 'disk.img', '16GB', bytes_per_sector_shift=200)
+    with open(image, 'rb') as fd:
+        assert diskforge.read_exfat_label(fd, PARTITION_LBA * SECTOR) is None
+
+
+def test_inspect_disk_rejects_out_of_range_partition(tmp_path):
+    image = build_image(tmp_path / 'disk.img', '16GB', first_lba=2 ** 62)
+    assert diskforge.inspect_disk(str(image), 15 * 1024 ** 3) == (False, "corrupt GPT")
+
+
+def test_inspect_disk_rejects_out_of_range_entries(tmp_path):
+    image = build_image(tmp_path / 'disk.img', '16GB', entries_lba=2 ** 62)
+    assert diskforge.inspect_disk(str(image), 15 * 1024 ** 3) == (False, "corrupt GPT")
+
+
+def test_detect_forged_disks_forces_write_profiled_disks(tmp_path, monkeypatch):
+    image = str(build_image(tmp_path / 'disk.img', '16GB'))
+    monkeypatch.setattr(diskforge, 'get_disk_sizes', lambda disks: {image: 15 * 1024 ** 3})
+
+    assert diskforge.detect_forged_disks([image]) == ([image], [])
+    assert diskforge.detect_forged_disks([image], force=[image]) == ([], [image])
@@ -0,0 +1,114 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import fleet
+
+FLEET = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fleet.py')
+
+
+def start(args, cwd):
+    return subprocess.Popen([sys.executable, FLEET] + args, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+
+def test_coordinator_collects_results_from_agents(tmp_path):
+    for name in ('a1.img', 'a2.img', 'b1.img', 'c1.img'):
+        (tmp_path / name).write_bytes(bytes(4 * 1024 * 1024))
+    dirty = bytearray(4 * 1024 * 1024)
+    dirty[5 * 512] = 1
+    (tmp_path / 'b2.img').write_bytes(bytes(dirty))
+
+    address = f"unix:{tmp_path / 'fleet.sock'}"
+    coordinator = start(['coordinator', '--listen', address, '--expect', '3', '--profile', 'detect',
+                         '--schedule', 'hostB=wipe-check', '--schedule', 'hostC=forge'], tmp_path)
+    while not (tmp_path / 'fleet.sock').exists():
+        assert coordinator.poll() is None, coordinator.stdout.read().decode()
+        time.sleep(0.1)
+
+    agents = [
+        start(['agent', '--connect', address, '--name', 'hostA', '--device', 'a1.img', '--device', 'a2.img'],
+              tmp_path),
+        start(['agent', '--connect', address, '--name', 'hostB', '--device', 'b1.img', '--device', 'b2.img'],
+              tmp_path),
+        # no --allow-forge, so the forge job must be refused and the image left alone
+        start(['agent', '--connect', address, '--name', 'hostC', '--device', 'c1.img'], tmp_path),
+    ]
+    for agent in agents:
+        assert agent.wait(timeout=60) == 0, agent.stdout.read().decode()
+    assert coordinator.wait(timeout=60) == 0, coordinator.stdout.read().decode()
+
+    summary = (tmp_path / 'diskforge_fleet.log').read_text()
+    assert "Host hostA (profile detect):\n  a1.img: PENDING\n" in summary
+    assert "  a2.img: PENDING\n" in summary
+    assert "  b1.img: PASS\n" in summary
+    assert "  b2.img: FAIL\n" in summary
+    assert "  c1.img: REJECTED\n" in summary
+    assert (tmp_path / 'c1.img').read_bytes() == bytes(4 * 1024 * 1024)
+
+
+def test_coordinator_rejects_duplicate_agent_names(tmp_path):
+    for name in ('x.img', 'y.img'):
+        (tmp_path / name).write_bytes(bytes(1024 * 1024))
+
+    address = f"unix:{tmp_path / 'fleet.sock'}"
+    coordinator = start(['coordinator', '--listen', address, '--expect', '1'], tmp_path)
+    while not (tmp_path / 'fleet.sock').exists():
+        assert coordinator.poll() is None, coordinator.stdout.read().decode()
+        time.sleep(0.1)
+
+    agents = [start(['agent', '--connect', address, '--name', 'same', '--device', name], tmp_path)
+              for name in ('x.img', 'y.img')]
+    codes = sorted(agent.wait(timeout=60) for agent in agents)
+    assert codes == [0, 1]
+    assert coordinator.wait(timeout=60) == 0, coordinator.stdout.read().decode()
+
+    summary = (tmp_path / 'diskforge_fleet.log').read_text()
+    assert summary.count("Host same (profile detect):") == 1
+
+
+def read_messages(sock):
+    data = b''
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        data += chunk
+    return [json.loads(line) for line in data.decode().splitlines()]
+
+
+def test_agent_streams_progress_for_long_stages(tmp_path):
+    path = tmp_path / 'disk.img'
+    path.write_bytes(bytes(4 * 1024 * 1024))
+    job = {'stages': ['profile'], 'options': {'config': {'zone_bytes': 1024 * 1024, 'random_duration': 0.3}}}
+    agent_end, coordinator_end = socket.socketpair()
+
+    fleet.run_disk_job('host', str(path), job, agent_end, threading.Lock(), threading.Event(), False,
+                       progress_interval=0.05)
+    agent_end.close()
+    messages = read_messages(coordinator_end)
+
+    progress = [m['progress'] for m in messages if m['type'] == 'status' and 'progress' in m]
+    assert progress and all('status' in p for p in progress)
+    assert messages[-1]['type'] == 'result'
+
+
+def test_agent_exits_cleanly_when_coordinator_hangs_up(tmp_path):
+    path = str(tmp_path / 'fleet.sock')
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(1)
+
+    def hang_up():
+        conn, _ = server.accept()
+        conn.recv(65536)
+        conn.close()
+
+    t = threading.Thread(target=hang_up)
+    t.start()
+    assert fleet.run_agent(f"unix:{path}", 'host', ['disk.img']) is False
+    t.join()
+    server.close()
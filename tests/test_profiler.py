@@ -0,0 +1,83 @@
+import os
+import threading
+from collections import defaultdict
+
+import disk_profiler
+
+FAST_CONFIG = dict(disk_profiler.PROFILE_CONFIG, zone_bytes=1024 * 1024, queue_depths=(1, 4), random_duration=0.1,
+                   sustained_duration=0.3, sustained_interval=0.1)
+
+
+def profile(path, perform_write=True):
+    update_queue = defaultdict(dict)
+    disk_profiler.profile_disk(str(path), update_queue, threading.Lock(), threading.Event(), perform_write,
+                               FAST_CONFIG, disk_profiler.PROFILE_THRESHOLDS)
+    return update_queue[str(path)]
+
+
+def test_profile_tiny_disk_stays_in_bounds(tmp_path):
+    path = tmp_path / 'tiny.img'
+    path.write_bytes(bytes(2048))
+
+    stats = profile(path)
+    assert 'error' not in stats
+    assert stats['status'] == 'DONE'
+    assert path.stat().st_size == 2048
+
+
+def test_profile_buffered_io_is_not_classified(tmp_path, monkeypatch):
+    path = tmp_path / 'disk.img'
+    path.write_bytes(bytes(8 * 1024 * 1024))
+    real_open = disk_profiler.os.open
+
+    def no_direct_open(file, flags, *args):
+        if flags & disk_profiler.os.O_DIRECT:
+            raise OSError(22, "Invalid argument")
+        return real_open(file, flags, *args)
+
+    monkeypatch.setattr(disk_profiler.os, 'open', no_direct_open)
+
+    stats = profile(path, perform_write=False)
+    assert stats['direct_io'] is False
+    assert stats['class'] == 'UNRELIABLE'
+
+
+def test_classify_profile_flags_collapse():
+    stats = {'outer_mbps': 150, 'rr_qd1_iops': 30, 'sustained_ratio': 0.1}
+    classification, issues = disk_profiler.classify_profile(stats, disk_profiler.PROFILE_THRESHOLDS)
+    assert classification == 'COLLAPSE'
+    assert issues == ['rr_qd1_iops 30', 'sustained write fell to 10%']
+
+
+def test_profile_stopped_disk_is_not_certified(tmp_path):
+    path = tmp_path / 'disk.img'
+    path.write_bytes(bytes(8 * 1024 * 1024))
+    update_queue = defaultdict(dict)
+    stop_event = threading.Event()
+    stop_event.set()
+
+    disk_profiler.profile_disk(str(path), update_queue, threading.Lock(), stop_event, True, FAST_CONFIG,
+                               disk_profiler.PROFILE_THRESHOLDS)
+    stats = update_queue[str(path)]
+    assert stats['class'] == 'STOPPED'
+    assert 'write_tested' not in stats
+
+
+def test_measure_random_gives_up_on_io_errors(tmp_path):
+    path = tmp_path / 'disk.img'
+    path.write_bytes(bytes(1024 * 1024))
+    # read-only fd, so every write fails
+    fd = os.open(str(path), os.O_RDONLY)
+    try:
+        iops, errors = disk_profiler.measure_random(fd, 1024 * 1024, 2, 5, True, threading.Event())
+    finally:
+        os.close(fd)
+    assert iops == 0
+    assert errors == 2 * disk_profiler.MAX_CONSECUTIVE_ERRORS
+
+
+def test_classify_profile_fails_on_io_errors():
+    classification, issues = disk_profiler.classify_profile({'rr_qd1_iops': 0, 'io_errors': 10},
+                                                            disk_profiler.PROFILE_THRESHOLDS)
+    assert classification == 'FAILED'
+    assert issues == ['10 I/O errors']
@@ -0,0 +1,36 @@
+import threading
+
+import disk_verifier
+
+
+def verify(path, mode='full'):
+    results = {}
+    disk_verifier.verify_disk(str(path), mode, 4, 1024 * 1024, b'\0', 1, results, threading.Lock(), 0)
+    return results[str(path)]
+
+
+def test_verify_disk_reports_dirty_sectors(tmp_path):
+    image = bytearray(4 * 1024 * 1024)
+    image[10 * 512 + 7] = 1
+    path = tmp_path / 'disk.img'
+    path.write_bytes(bytes(image))
+
+    certificate = verify(path)
+    assert certificate['result'] == 'FAIL'
+    assert certificate['bad_lbas'] == [10]
+    assert certificate['coverage'] == 100
+
+
+def test_verify_disk_passes_clean_disk(tmp_path):
+    path = tmp_path / 'disk.img'
+    path.write_bytes(bytes(4 * 1024 * 1024))
+    assert verify(path)['result'] == 'PASS'
+
+
+def test_verify_disk_empty_device_is_not_certified(tmp_path):
+    path = tmp_path / 'empty.img'
+    path.write_bytes(b'')
+
+    certificate = verify(path)
+    assert certificate['result'] == 'ERROR'
+    assert certificate['coverage'] == 0